@@ -1,2 +1,7 @@
 from .tweaks import *
-from .mods import *
\ No newline at end of file
+from .mods import *
+from .addons import *
+from .snapshots import *
+from .state import *
+from .planner import *
+from .bundle import *
\ No newline at end of file
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+ADDON_INDEX_VERSION = 3
+
+TOC_FIELDS = {
+    "title": "Title",
+    "version": "Version",
+    "dependencies": "Dependencies",
+    "saved_variables": "SavedVariables",
+}
+# Alternative spellings used by the 1.12 client for the same fields
+TOC_ALIASES = {
+    "RequiredDeps": "Dependencies",
+    "Dependancies": "Dependencies",
+    "Dependences": "Dependencies",
+    "Dep": "Dependencies",
+}
+
+
+class InstalledAddon(object):
+    name: str = ""
+    title: str = ""
+    version: str = ""
+    dependencies: list[str] = []
+    saved_variables: list[str] = []
+    saved_variables_per_character: list[str] = []
+    fingerprint: str = ""
+    dir_mtimes: dict[str, int] = {}
+    toc_name: str = ""
+    toc_mtime: int = 0
+    toc_size: int = 0
+
+    def __init__(self, data: dict):
+        self.name = data["name"] if "name" in data else ""
+        self.title = data["title"] if "title" in data else ""
+        self.version = data["version"] if "version" in data else ""
+        self.dependencies = data["dependencies"] if "dependencies" in data else []
+        self.saved_variables = data["saved_variables"] if "saved_variables" in data else []
+        self.saved_variables_per_character = data["saved_variables_per_character"] \
+            if "saved_variables_per_character" in data else []
+        self.fingerprint = data["fingerprint"] if "fingerprint" in data else ""
+        self.dir_mtimes = data["dir_mtimes"] if "dir_mtimes" in data else {}
+        self.toc_name = data["toc_name"] if "toc_name" in data else ""
+        self.toc_mtime = data["toc_mtime"] if "toc_mtime" in data else 0
+        self.toc_size = data["toc_size"] if "toc_size" in data else 0
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "title": self.title,
+            "version": self.version,
+            "dependencies": self.dependencies,
+            "saved_variables": self.saved_variables,
+            "saved_variables_per_character": self.saved_variables_per_character,
+            "fingerprint": self.fingerprint,
+            "dir_mtimes": self.dir_mtimes,
+            "toc_name": self.toc_name,
+            "toc_mtime": self.toc_mtime,
+            "toc_size": self.toc_size,
+        }
+
+
+class Addon(object):
+    name: str = ""
+    addon_name: str = ""
+    description: str = ""
+    git_url: str = ""
+    default_enabled: bool = True
+
+    def __init__(self, addon_data: dict):
+        self.name = addon_data["name"] if "name" in addon_data else ""
+        self.addon_name = addon_data["addon_name"] if "addon_name" in addon_data else self.name
+        self.description = addon_data["description"] if "description" in addon_data else ""
+        self.git_url = addon_data["git_url"] if "git_url" in addon_data else ""
+        self.default_enabled = addon_data["default_enabled"] if "default_enabled" in addon_data else True
+
+    def is_installed(self, index: "AddonIndex") -> bool:
+        return index.get(self.addon_name) is not None
+
+    def installed_version(self, index: "AddonIndex") -> str:
+        installed = index.get(self.addon_name)
+        return installed.version if installed else ""
+
+
+def parse_toc(toc_path: Path) -> dict:
+    fields = {}
+    with open(toc_path, "r", encoding="utf-8", errors="replace") as toc:
+        for line in toc:
+            line = line.strip()
+            if not line.startswith("##"):
+                continue
+            key, sep, value = line[2:].partition(":")
+            if not sep:
+                continue
+            key = key.strip()
+            key = TOC_ALIASES.get(key, key)
+            if key not in fields:
+                fields[key] = value.strip()
+    return fields
+
+
+def _split_list(value: str) -> list[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def folder_fingerprint(folder: Path) -> str:
+    # Relative path, size and mtime of every file, so any change in the tree shows up
+    h = hashlib.sha1()
+    entries = []
+    for root, dirs, files in os.walk(folder):
+        for f in files:
+            full = os.path.join(root, f)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            rel = os.path.relpath(full, folder).replace("\\", "/").lower()
+            entries.append(f"{rel}|{st.st_size}|{st.st_mtime_ns}")
+    for e in sorted(entries):
+        h.update(e.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def directory_mtimes(folder: Path) -> dict[str, int]:
+    # mtime of the folder and every subfolder, these change when files are added, removed or renamed
+    mtimes = {}
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        mtimes[os.path.relpath(current, folder).replace("\\", "/")] = os.stat(current).st_mtime_ns
+        try:
+            for entry in os.scandir(current):
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+        except OSError:
+            pass
+    return mtimes
+
+
+def _find_toc(folder: Path, name: str):
+    toc = folder / f"{name}.toc"
+    if toc.exists():
+        return toc
+    # Case-insensitive match, folders copied from Windows often differ in casing
+    lower = f"{name}.toc".lower()
+    try:
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.lower() == lower:
+                return Path(entry.path)
+    except OSError:
+        pass
+    return None
+
+
+def addon_index_file(index_dir, addons_path) -> Path:
+    # One index per game folder, so switching between installs does not throw away the other scan
+    key = hashlib.sha1(str(Path(addons_path)).encode("utf-8")).hexdigest()[:16]
+    return Path(index_dir) / f"{key}.json"
+
+
+class AddonIndex(object):
+    addons_path: Path = None
+    index_path: Path = None
+    addons: dict[str, InstalledAddon] = {}
+
+    def __init__(self, addons_path, index_path=None):
+        self.addons_path = Path(addons_path)
+        self.index_path = Path(index_path) if index_path else None
+        self.addons = {}
+        self.load()
+
+    def load(self):
+        if not self.index_path or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path) as json_file:
+                json_data = json.load(json_file)
+        except (OSError, ValueError):
+            return
+        if json_data.get("version") != ADDON_INDEX_VERSION:
+            return
+        if json_data.get("addons_path") != str(self.addons_path):
+            return
+        self.addons = {a["name"]: InstalledAddon(a) for a in json_data.get("addons", [])}
+
+    def save(self) -> (bool, list[str]):
+        if not self.index_path:
+            return True, []
+        json_data = {
+            "version": ADDON_INDEX_VERSION,
+            "addons_path": str(self.addons_path),
+            "addons": [a.to_dict() for a in self.addons.values()],
+        }
+        tmp = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w") as json_file:
+                json.dump(json_data, json_file)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            return False, [f"Failed to save addon index: {e}"]
+        return True, []
+
+    def _scan_addon(self, folder: Path, dir_mtimes: dict[str, int]) -> InstalledAddon:
+        addon = InstalledAddon({"name": folder.name, "dir_mtimes": dir_mtimes})
+        toc = _find_toc(folder, folder.name)
+        if toc is not None:
+            st = toc.stat()
+            addon.toc_name = toc.name
+            addon.toc_mtime = st.st_mtime_ns
+            addon.toc_size = st.st_size
+            fields = parse_toc(toc)
+            addon.title = fields.get(TOC_FIELDS["title"], "")
+            addon.version = fields.get(TOC_FIELDS["version"], "")
+            addon.dependencies = _split_list(fields.get(TOC_FIELDS["dependencies"], ""))
+            addon.saved_variables = _split_list(fields.get(TOC_FIELDS["saved_variables"], ""))
+            addon.saved_variables_per_character = _split_list(fields.get("SavedVariablesPerCharacter", ""))
+        addon.fingerprint = folder_fingerprint(folder)
+        return addon
+
+    def _is_current(self, addon: InstalledAddon, folder: Path) -> bool:
+        # Only stats the directories recorded at the last scan, nothing is listed. A new subfolder
+        # changes its parent's mtime, so files added, removed or replaced (updaters and most editors
+        # write a new file and rename it) anywhere in the addon are caught, as is any .toc change.
+        # A file rewritten in place without touching its directory or the .toc is only picked up by
+        # refresh(force=True).
+        if not addon.dir_mtimes:
+            return False
+        try:
+            for rel, mtime in addon.dir_mtimes.items():
+                if os.stat(folder / rel).st_mtime_ns != mtime:
+                    return False
+            if not addon.toc_name:
+                # A .toc added since would have changed the folder mtime
+                return True
+            st = os.stat(folder / addon.toc_name)
+        except OSError:
+            return False
+        return addon.toc_mtime == st.st_mtime_ns and addon.toc_size == st.st_size
+
+    def refresh(self, force: bool = False) -> (list[str], list[str], list[str]):
+        # Returns names of added, updated and removed addons
+        added, updated, removed = [], [], []
+        if not self.addons_path.is_dir():
+            removed = list(self.addons.keys())
+            self.addons = {}
+            return added, updated, removed
+
+        seen = set()
+        for entry in os.scandir(self.addons_path):
+            if not entry.is_dir():
+                continue
+            seen.add(entry.name)
+            folder = Path(entry.path)
+            existing = self.addons.get(entry.name)
+            if existing is not None and not force and self._is_current(existing, folder):
+                continue
+            addon = self._scan_addon(folder, directory_mtimes(folder))
+            if existing is None:
+                added.append(addon.name)
+            elif existing.fingerprint != addon.fingerprint:
+                updated.append(addon.name)
+            self.addons[addon.name] = addon
+
+        for name in list(self.addons.keys()):
+            if name not in seen:
+                del self.addons[name]
+                removed.append(name)
+
+        return added, updated, removed
+
+    def get(self, name: str):
+        if name in self.addons:
+            return self.addons[name]
+        lower = name.lower()
+        for addon in self.addons.values():
+            if addon.name.lower() == lower:
+                return addon
+        return None
+
+    def all(self) -> list[InstalledAddon]:
+        return sorted(self.addons.values(), key=lambda a: a.name.lower())
+
+    def search(self, text: str) -> list[InstalledAddon]:
+        text = text.lower()
+        return [a for a in self.all() if text in a.name.lower() or text in a.title.lower()]
+
+    def dependents(self, name: str) -> list[InstalledAddon]:
+        lower = name.lower()
+        return [a for a in self.all() if lower in [d.lower() for d in a.dependencies]]
+
+    def missing_dependencies(self) -> dict[str, list[str]]:
+        missing = {}
+        for addon in self.all():
+            deps = [d for d in addon.dependencies if self.get(d) is None]
+            if deps:
+                missing[addon.name] = deps
+        return missing
+
+
+def load_addons_from_json(json_data) -> list[Addon]:
+    addons = []
+    # addons.json is a plain list, but accept the {"addons": [...]} layout used by the other catalogs
+    if isinstance(json_data, dict):
+        json_data = json_data["addons"] if "addons" in json_data else []
+    for addon in json_data:
+        addons.append(Addon(addon))
+
+    return addons
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import time
+import urllib.request
+import zipfile
+from configparser import ConfigParser
+from pathlib import Path, PurePosixPath
+
+from .mods import Mod
+from .tweaks import Tweak, download_vanilla_tweaks, vanilla_tweaks_binary
+
+BUNDLE_FORMAT = 1
+BUNDLE_MANIFEST = "manifest.json"
+COPY_SIZE = 1024 * 1024
+
+
+def _hash_file(p: Path) -> (int, str):
+    h = hashlib.sha256()
+    size = 0
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(COPY_SIZE), b""):
+            h.update(block)
+            size += len(block)
+    return size, h.hexdigest()
+
+
+def _stage_tweak(tweak: Tweak, dest: Path) -> str:
+    # Downloads the latest build and lays out the files as they would end up in the game folder
+    url, version = tweak.resolve_download()
+    if not url:
+        raise ValueError(f"No download URL found for {tweak.name}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir) / "download"
+        urllib.request.urlretrieve(url, tmp)
+        if tweak.zip:
+            with zipfile.ZipFile(tmp) as zip_file:
+                if tweak.extractall:
+                    zip_file.extractall(dest)
+                else:
+                    zip_file.extract(tweak.dll_name, dest)
+        else:
+            dest.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest / tweak.dll_name)
+    return version
+
+
+def _stage_mod(mod: Mod, dest: Path) -> str:
+    if not mod.direct_url:
+        raise ValueError(f"{mod.name} has no direct link (Only direct links are supported for mods)")
+    target = dest / mod.dest_path
+    target.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir) / "download"
+        urllib.request.urlretrieve(mod.direct_url, tmp)
+        if mod.zip:
+            with zipfile.ZipFile(tmp) as zip_file:
+                zip_file.extract(mod.mpq_name, target)
+        else:
+            os.replace(tmp, target / mod.mpq_name)
+    return mod.direct_url
+
+
+def export_bundle(bundle_path: str, tweaks: list[Tweak], mods: list[Mod], vt_url: str,
+                  windows: bool) -> (bool, list[str]):
+    messages = []
+    success = True
+    items = []
+
+    with tempfile.TemporaryDirectory() as staging_dir:
+        staging = Path(staging_dir)
+        sources = []
+        n = 0
+        for kind, entries in (("tweak", tweaks), ("mod", mods), ("vanilla_tweaks", [None])):
+            for entry in entries:
+                n += 1
+                item_dir = staging / str(n)
+                try:
+                    if kind == "tweak":
+                        name, version = entry.name, _stage_tweak(entry, item_dir)
+                    elif kind == "mod":
+                        name, version = entry.name, _stage_mod(entry, item_dir)
+                    else:
+                        name, version = "VanillaTweaks", vt_url
+                        download_vanilla_tweaks(vt_url, str(item_dir), windows)
+                except Exception as e:
+                    success = False
+                    messages.append(f"Failed to fetch {kind} {entry.name if entry else 'VanillaTweaks'}: {e}")
+                    continue
+
+                files = []
+                for root, dirs, filenames in os.walk(item_dir):
+                    for f in sorted(filenames):
+                        full = Path(root) / f
+                        rel = full.relative_to(item_dir).as_posix()
+                        size, sha256 = _hash_file(full)
+                        arcname = f"files/{n}/{rel}"
+                        files.append({"path": rel, "arcname": arcname, "size": size, "sha256": sha256})
+                        sources.append((full, arcname))
+                items.append({"kind": kind, "name": name, "version": version, "files": files})
+                messages.append(f"Added {kind} {name} to the bundle.")
+
+        manifest = json.dumps({
+            "format": BUNDLE_FORMAT,
+            "created": time.time(),
+            "windows": windows,
+            "vt_url": vt_url,
+            "items": items,
+        }, indent=2).encode("utf-8")
+
+        tmp_path = f"{bundle_path}.tmp"
+        try:
+            with tarfile.open(tmp_path, "w:gz") as tar:
+                # The manifest goes first so imports can stream the rest without seeking
+                info = tarfile.TarInfo(BUNDLE_MANIFEST)
+                info.size = len(manifest)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(manifest))
+                for full, arcname in sources:
+                    tar.add(full, arcname=arcname, recursive=False)
+            os.replace(tmp_path, bundle_path)
+        except OSError as e:
+            return False, messages + [f"Failed to write bundle: {e}"]
+
+    messages.append(f"Exported {len(items)} items to {bundle_path}")
+    return success, messages
+
+
+def _safe_destination(game_path: str, rel: str):
+    # Bundles come from other machines, only plain relative paths inside the game folder are accepted
+    if not rel or "\\" in rel or ":" in rel:
+        return None
+    p = PurePosixPath(rel)
+    if p.is_absolute() or ".." in p.parts or not p.parts:
+        return None
+    dest = Path(game_path).joinpath(*p.parts)
+    if not dest.resolve().is_relative_to(Path(game_path).resolve()):
+        return None
+    return dest
+
+
+def import_bundle(bundle_path: str, config: ConfigParser, windows: bool, names: set = None,
+                  before_write=None) -> (bool, list[str], dict, set):
+    # Streams every entry straight into the game folder, names limits the tweaks/mods that are installed.
+    # Returns the names of the items that were installed completely next to the manifest.
+    # before_write is called with every path the bundle will write, before the first one is written.
+    path = config["turtle"]["turtle_path"]
+    messages = []
+    manifest = {}
+    targets = {}
+    written = set()
+    failed = set()
+    installed = set()
+
+    try:
+        with tarfile.open(bundle_path, "r|gz") as tar:
+            for member in tar:
+                if not manifest:
+                    if member.name != BUNDLE_MANIFEST:
+                        return False, [f"{bundle_path} is not a Koopa bundle."], {}, installed
+                    manifest = json.load(tar.extractfile(member))
+                    if manifest.get("format") != BUNDLE_FORMAT:
+                        return False, [f"Unsupported bundle format {manifest.get('format')}."], {}, installed
+                    if manifest.get("windows") != windows:
+                        return False, ["This bundle was exported for a different operating system."], {}, installed
+                    for item in manifest["items"]:
+                        if names is not None and item["kind"] != "vanilla_tweaks" and item["name"] not in names:
+                            continue
+                        for f in item["files"]:
+                            dest = _safe_destination(path, f["path"])
+                            if dest is None:
+                                return False, [f"Refusing to import, {f['path']} points outside the game folder."], {}, \
+                                    installed
+                            targets[f["arcname"]] = (item, f, dest)
+                    if before_write:
+                        before_write([f["path"] for _, f, _ in targets.values()])
+                    continue
+
+                if not member.isfile() or member.name not in targets:
+                    continue
+                item, f, dest = targets[member.name]
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                tmp = dest.with_name(dest.name + ".koopa-import")
+                h = hashlib.sha256()
+                source = tar.extractfile(member)
+                with open(tmp, "wb") as out:
+                    for block in iter(lambda: source.read(COPY_SIZE), b""):
+                        h.update(block)
+                        out.write(block)
+                if h.hexdigest() != f["sha256"]:
+                    os.remove(tmp)
+                    failed.add(item["name"])
+                    messages.append(f"Checksum mismatch for {f['path']}, skipped.")
+                    continue
+                os.replace(tmp, dest)
+                written.add(member.name)
+                if f["path"] == vanilla_tweaks_binary(True) or f["path"] == vanilla_tweaks_binary(False):
+                    os.chmod(dest, 0o755)
+    except (OSError, tarfile.TarError, ValueError) as e:
+        return False, messages + [f"Failed to read bundle: {e}"], manifest, installed
+    if not manifest:
+        # An empty archive never reaches the manifest check above
+        return False, [f"{bundle_path} is not a Koopa bundle."], {}, installed
+
+    for item in manifest["items"]:
+        arcnames = [f["arcname"] for f in item["files"]]
+        if not arcnames or arcnames[0] not in targets:
+            continue
+        if not all(a in written for a in arcnames):
+            failed.add(item["name"])
+            messages.append(f"{item['name']} was not installed, the bundle is incomplete.")
+            continue
+        if item["kind"] == "tweak":
+            config["tweaks"][item["name"]] = item["version"]
+        elif item["kind"] == "mod":
+            config["mods"][item["name"]] = item["version"]
+        installed.add(item["name"])
+        messages.append(f"Installed {item['name']} from bundle.")
+
+    return not failed, messages, manifest, installed
@@ -0,0 +1,164 @@
+import json
+from configparser import ConfigParser
+from pathlib import Path
+
+from .mods import Mod
+from .state import StateStore
+from .tweaks import Tweak, apply_vanilla_tweaks, update_dll_txt, set_wtf_config, dll_txt_content, wtf_config_lines
+
+OP_INSTALL_TWEAK = "install_tweak"
+OP_INSTALL_MOD = "install_mod"
+OP_VANILLA_TWEAKS = "vanilla_tweaks"
+OP_DLL_TXT = "dll_txt"
+OP_WTF_CONFIG = "wtf_config"
+
+VANILLA_TWEAKS_SETTING = "vanilla_tweaks"
+
+
+class Operation(object):
+    kind: str = ""
+    target = None
+    reason: str = ""
+
+    def __init__(self, kind: str, target=None, reason: str = ""):
+        self.kind = kind
+        self.target = target
+        self.reason = reason
+
+    def describe(self) -> str:
+        if self.kind == OP_INSTALL_TWEAK:
+            version = f" {self.target.new_version}" if self.target.new_version else ""
+            action = f"Install tweak {self.target.name}{version}"
+        elif self.kind == OP_INSTALL_MOD:
+            action = f"Install mod {self.target.name}"
+        elif self.kind == OP_VANILLA_TWEAKS:
+            action = "Patch WoW.exe with VanillaTweaks"
+        elif self.kind == OP_DLL_TXT:
+            action = "Rewrite dlls.txt"
+        elif self.kind == OP_WTF_CONFIG:
+            action = "Update WTF/Config.wtf"
+        else:
+            action = self.kind
+        return f"{action} ({self.reason})" if self.reason else action
+
+
+class Plan(object):
+    game_path: str = ""
+    operations: list[Operation] = []
+
+    def __init__(self, game_path: str):
+        self.game_path = game_path
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def __iter__(self):
+        return iter(self.operations)
+
+    def add(self, kind: str, target=None, reason: str = ""):
+        self.operations.append(Operation(kind, target, reason))
+
+    def describe(self) -> list[str]:
+        if not self.operations:
+            return ["Nothing to do, the game folder is already up to date."]
+        return [f"{i + 1}. {op.describe()}" for i, op in enumerate(self.operations)]
+
+
+def _file_stat(p: Path) -> (int, int):
+    try:
+        st = p.stat()
+    except OSError:
+        return 0, 0
+    return st.st_size, st.st_mtime_ns
+
+
+def vanilla_tweaks_state(path: str, url: str, settings: dict) -> str:
+    # WoW.exe and WoW_tweaked.exe fingerprints plus the patcher build and settings, stored after every
+    # successful patch. A replaced or damaged patched exe no longer matches and gets patched again.
+    wow_size, wow_mtime = _file_stat(Path(path) / "WoW.exe")
+    tweaked_size, tweaked_mtime = _file_stat(Path(path) / "WoW_tweaked.exe")
+    return json.dumps({
+        "url": url,
+        "settings": settings,
+        "wow_size": wow_size,
+        "wow_mtime": wow_mtime,
+        "tweaked_size": tweaked_size,
+        "tweaked_mtime": tweaked_mtime,
+    }, sort_keys=True)
+
+
+def _read_text(p: Path):
+    try:
+        with open(p, "r") as f:
+            return f.read()
+    except (FileNotFoundError, PermissionError):
+        return None
+
+
+def make_plan(path: str, tweaks: list[Tweak], mods: list[Mod], state: StateStore,
+              vt_url: str, vt_settings: dict) -> Plan:
+    # tweaks and mods are the selected ones, has_update reflects the last update check
+    plan = Plan(path)
+
+    for tweak in tweaks:
+        if tweak.has_update:
+            plan.add(OP_INSTALL_TWEAK, tweak, "update available" if (Path(path) / tweak.dll_name).exists()
+                     else "not installed")
+    for mod in mods:
+        if mod.has_update:
+            plan.add(OP_INSTALL_MOD, mod, "not installed")
+
+    if not (Path(path) / "WoW_tweaked.exe").exists():
+        plan.add(OP_VANILLA_TWEAKS, reason="WoW_tweaked.exe missing")
+    elif state.get_setting(VANILLA_TWEAKS_SETTING, path) != vanilla_tweaks_state(path, vt_url, vt_settings):
+        plan.add(OP_VANILLA_TWEAKS, reason="WoW.exe or patch settings changed")
+
+    if _read_text(Path(path) / "dlls.txt") != dll_txt_content(tweaks):
+        plan.add(OP_DLL_TXT, reason="does not match the selected tweaks")
+
+    existing = _read_text(Path(path) / "WTF" / "Config.wtf")
+    if existing is None:
+        plan.add(OP_WTF_CONFIG, reason="Config.wtf missing")
+    else:
+        lines = [l.rstrip() for l in existing.splitlines()]
+        if wtf_config_lines(lines) != lines:
+            plan.add(OP_WTF_CONFIG, reason="settings differ")
+
+    return plan
+
+
+def execute_operation(op: Operation, config: ConfigParser, state: StateStore, tweaks: list[Tweak],
+                      vt_url: str, vt_settings: dict, download: bool = True,
+                      before_write=None) -> (bool, list[str]):
+    # before_write is passed on to installs that only know which files they write once they run
+    path = config["turtle"]["turtle_path"]
+
+    if op.kind == OP_INSTALL_TWEAK:
+        success, messages = op.target.install(config, before_write)
+    elif op.kind == OP_INSTALL_MOD:
+        success, messages = op.target.install(config)
+    elif op.kind == OP_VANILLA_TWEAKS:
+        tweaked = Path(path) / "WoW_tweaked.exe"
+        before = _file_stat(tweaked)
+        success, messages = apply_vanilla_tweaks(path, vt_url, vt_settings, download)
+        # A WoW_tweaked.exe left over from an earlier run says nothing about this one
+        after = _file_stat(tweaked)
+        if success and after != (0, 0) and after != before:
+            state.set_setting(VANILLA_TWEAKS_SETTING, vanilla_tweaks_state(path, vt_url, vt_settings), path)
+        elif success:
+            success = False
+            messages = list(messages) + ["VanillaTweaks did not write WoW_tweaked.exe."]
+    elif op.kind == OP_DLL_TXT:
+        success, messages = update_dll_txt(path, tweaks)
+        if success:
+            messages = ["Updated dlls.txt with the selected tweaks."]
+    elif op.kind == OP_WTF_CONFIG:
+        success, messages = set_wtf_config(path)
+    else:
+        return False, [f"Unknown operation {op.kind}"]
+
+    # Some of the helpers return a single message instead of a list
+    if isinstance(messages, str):
+        messages = [messages]
+    return success, [str(m) for m in messages]
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from pathlib import Path
+
+from .tweaks import vanilla_tweaks_binary
+
+# Content defined chunking parameters, chunk boundaries follow the data so an
+# insertion near the start of a file does not shift every later chunk.
+CHUNK_MIN = 16 * 1024
+CHUNK_AVG = 64 * 1024
+CHUNK_MAX = 256 * 1024
+CHUNK_MASK = CHUNK_AVG - 1
+READ_SIZE = 1024 * 1024
+
+_rng = random.Random(0x4b6f6f7061)
+GEAR = [_rng.getrandbits(32) for _ in range(256)]
+del _rng
+
+
+def chunk_boundaries(data: bytes, final: bool = True) -> list[int]:
+    # Gear hash based boundaries, returns end offsets of every complete chunk
+    ends = []
+    start = 0
+    size = len(data)
+    gear = GEAR
+    while size - start > 0:
+        if size - start <= CHUNK_MIN:
+            if final:
+                ends.append(size)
+            break
+        end = min(start + CHUNK_MAX, size)
+        h = 0
+        i = start + CHUNK_MIN
+        cut = -1
+        while i < end:
+            h = ((h << 1) + gear[data[i]]) & 0xFFFFFFFF
+            i += 1
+            if h & CHUNK_MASK == 0:
+                cut = i
+                break
+        if cut == -1:
+            if end == size and not final and end - start < CHUNK_MAX:
+                break
+            cut = end
+        ends.append(cut)
+        start = cut
+    return ends
+
+
+def iter_chunks(f):
+    buffer = b""
+    eof = False
+    while not eof:
+        data = f.read(READ_SIZE)
+        if not data:
+            eof = True
+        buffer += data
+        start = 0
+        for end in chunk_boundaries(buffer, final=eof):
+            yield buffer[start:end]
+            start = end
+        buffer = buffer[start:]
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Snapshot(object):
+    id: str = ""
+    game_path: str = ""
+    label: str = ""
+    created: float = 0.0
+    files: dict = {}
+    meta: dict = {}
+
+    def __init__(self, data: dict):
+        self.id = data["id"] if "id" in data else ""
+        self.game_path = data["game_path"] if "game_path" in data else ""
+        self.label = data["label"] if "label" in data else ""
+        self.created = data["created"] if "created" in data else 0.0
+        # Relative path -> {size, mtime_ns, sha256, chunks}, or None if the file did not exist
+        self.files = data["files"] if "files" in data else {}
+        self.meta = data["meta"] if "meta" in data else {}
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "game_path": self.game_path,
+            "label": self.label,
+            "created": self.created,
+            "files": self.files,
+            "meta": self.meta,
+        }
+
+    def created_str(self) -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+
+
+class SnapshotStore(object):
+    root: Path = None
+
+    def __init__(self, root):
+        self.root = Path(root)
+        (self.root / "chunks").mkdir(parents=True, exist_ok=True)
+        (self.root / "snapshots").mkdir(parents=True, exist_ok=True)
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.root / "chunks" / digest[:2] / digest
+
+    def _put_chunk(self, digest: str, data: bytes) -> bool:
+        p = self._chunk_path(digest)
+        if p.exists():
+            return False
+        p.parent.mkdir(exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(data, 1))
+        os.replace(tmp, p)
+        return True
+
+    def _get_chunk(self, digest: str) -> bytes:
+        with open(self._chunk_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def snapshots(self, game_path: str = None) -> list[Snapshot]:
+        # Newest first
+        result = []
+        for p in (self.root / "snapshots").glob("*.json"):
+            try:
+                with open(p) as json_file:
+                    snapshot = Snapshot(json.load(json_file))
+            except (OSError, ValueError):
+                continue
+            if game_path is None or snapshot.game_path == str(game_path):
+                result.append(snapshot)
+        result.sort(key=lambda s: s.created, reverse=True)
+        return result
+
+    def latest(self, game_path: str):
+        snapshots = self.snapshots(game_path)
+        return snapshots[0] if snapshots else None
+
+    def _add_files(self, snapshot: Snapshot, paths: list[str], previous_files: dict) -> (int, list[str]):
+        # Stores the current content of paths in the snapshot, returns the number of new chunks
+        messages = []
+        new_chunks = 0
+        for rel in sorted(set(paths)):
+            full = Path(snapshot.game_path) / rel
+            if not full.is_file():
+                snapshot.files[rel] = None
+                continue
+            st = full.stat()
+            old = previous_files.get(rel)
+            # Unchanged since the last snapshot, reuse its chunk list without reading the file
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                snapshot.files[rel] = old
+                continue
+            h = hashlib.sha256()
+            chunks = []
+            try:
+                with open(full, "rb") as f:
+                    for data in iter_chunks(f):
+                        h.update(data)
+                        digest = hashlib.sha256(data).hexdigest()
+                        if self._put_chunk(digest, data):
+                            new_chunks += 1
+                        chunks.append(digest)
+            except OSError as e:
+                messages.append(f"Could not snapshot {rel}: {e}")
+                continue
+            snapshot.files[rel] = {
+                "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest(), "chunks": chunks
+            }
+        return new_chunks, messages
+
+    def _write(self, snapshot: Snapshot):
+        p = self.root / "snapshots" / f"{snapshot.id}.json"
+        with open(p.with_suffix(".tmp"), "w") as json_file:
+            json.dump(snapshot.to_dict(), json_file)
+        os.replace(p.with_suffix(".tmp"), p)
+
+    def create(self, game_path: str, paths: list[str], label: str = "", meta: dict = None) -> (Snapshot, list[str]):
+        previous = self.latest(game_path)
+        snapshot = Snapshot({
+            "id": f"{int(time.time() * 1000)}",
+            "game_path": str(game_path),
+            "label": label,
+            "created": time.time(),
+            "meta": meta or {},
+        })
+        new_chunks, messages = self._add_files(snapshot, paths, previous.files if previous else {})
+        self._write(snapshot)
+        files = snapshot.files
+        messages.append(f"Created snapshot of {len([f for f in files.values() if f])} files ({new_chunks} new chunks).")
+        return snapshot, messages
+
+    def extend(self, snapshot: Snapshot, paths: list[str]) -> list[str]:
+        # Adds files that are only known once an install has started, like the contents of an archive.
+        # Paths already in the snapshot keep their content from before the install.
+        paths = [rel for rel in paths if rel not in snapshot.files]
+        if not paths:
+            return []
+        _, messages = self._add_files(snapshot, paths, {})
+        self._write(snapshot)
+        return messages
+
+    def _is_unchanged(self, full: Path, entry: dict) -> bool:
+        if not full.is_file():
+            return False
+        st = full.stat()
+        if st.st_size != entry["size"]:
+            return False
+        if st.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        return file_sha256(full) == entry["sha256"]
+
+    def restore(self, snapshot: Snapshot) -> (bool, list[str]):
+        messages = []
+        success = True
+        restored = 0
+        for rel, entry in snapshot.files.items():
+            full = Path(snapshot.game_path) / rel
+            try:
+                if entry is None:
+                    # Did not exist before the install, remove it again
+                    if full.is_file():
+                        full.unlink()
+                        restored += 1
+                    continue
+                if self._is_unchanged(full, entry):
+                    continue
+                full.parent.mkdir(parents=True, exist_ok=True)
+                tmp = full.with_name(full.name + ".koopa-restore")
+                with open(tmp, "wb") as f:
+                    for digest in entry["chunks"]:
+                        f.write(self._get_chunk(digest))
+                os.replace(tmp, full)
+                os.utime(full, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+                restored += 1
+            except (OSError, zlib.error) as e:
+                success = False
+                messages.append(f"Failed to restore {rel}: {e}")
+        messages.append(f"Restored {restored} files from snapshot {snapshot.created_str()}.")
+        return success, messages
+
+    def prune(self, game_path: str, keep: int = 5) -> int:
+        # Drops old snapshots for a folder and removes chunks no snapshot refers to anymore
+        for snapshot in self.snapshots(game_path)[keep:]:
+            try:
+                (self.root / "snapshots" / f"{snapshot.id}.json").unlink()
+            except OSError:
+                pass
+
+        referenced = set()
+        for snapshot in self.snapshots():
+            for entry in snapshot.files.values():
+                if entry:
+                    referenced.update(entry["chunks"])
+
+        removed = 0
+        for p in (self.root / "chunks").glob("*/*"):
+            if p.name not in referenced:
+                try:
+                    p.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+def snapshot_paths(tweaks: list, mods: list, windows: bool) -> list[str]:
+    paths = ["dlls.txt", "WTF/Config.wtf", "WoW_tweaked.exe", vanilla_tweaks_binary(windows)]
+    for tweak in tweaks:
+        if tweak.dll_name:
+            paths.append(tweak.dll_name)
+    for mod in mods:
+        if mod.mpq_name:
+            paths.append(str(Path(mod.dest_path) / mod.mpq_name).replace("\\", "/"))
+    return paths
@@ -0,0 +1,312 @@
+import configparser
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+STATE_SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    game_path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (game_path, key)
+);
+CREATE TABLE IF NOT EXISTS installs (
+    game_path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    enabled INTEGER,
+    updated REAL,
+    PRIMARY KEY (game_path, kind, name)
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    game_path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    PRIMARY KEY (game_path, path)
+);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated REAL
+);
+"""
+
+# config.cfg section -> (install kind, column)
+CONFIG_SECTIONS = {
+    "tweaks": ("tweak", "version"),
+    "enabled_tweaks": ("tweak", "enabled"),
+    "mods": ("mod", "version"),
+    "enabled_mods": ("mod", "enabled"),
+}
+
+GLOBAL = ""
+
+
+def install_name(name: str) -> str:
+    # configparser lowercases option names, manifests use the same form so both tables join on name
+    return name.lower()
+
+
+class StateStore(object):
+    db_path: Path = None
+    connection: sqlite3.Connection = None
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._depth = 0
+        self._loaded = {}
+        # Autocommit mode, transactions are managed explicitly in transaction()
+        self.connection = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA busy_timeout=10000")
+        with self.transaction():
+            # executescript() would commit the open transaction, so run the statements one by one
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.connection.execute(statement)
+            self.connection.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)", (str(STATE_SCHEMA_VERSION),)
+            )
+            if int(self.get_meta("schema_version", "0")) < 2:
+                # Version 1 stored manifests under the catalog name
+                self.connection.execute("UPDATE manifests SET name = lower(name)")
+            self.set_meta("schema_version", str(STATE_SCHEMA_VERSION))
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outer transaction, only the outermost one commits
+        if self._depth == 0:
+            self.connection.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield self.connection
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.connection.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.connection.execute("COMMIT")
+
+    def get_meta(self, key: str, default: str = "") -> str:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        with self.transaction() as c:
+            c.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_setting(self, key: str, game_path: str = GLOBAL, default: str = "") -> str:
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE game_path = ? AND key = ?", (str(game_path), key)
+        ).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    def set_setting(self, key: str, value: str, game_path: str = GLOBAL):
+        with self.transaction() as c:
+            c.execute(
+                "INSERT OR REPLACE INTO settings (game_path, key, value) VALUES (?, ?, ?)", (str(game_path), key, value)
+            )
+
+    def installs(self, game_path: str, kind: str = None, name: str = None) -> list[dict]:
+        query = "SELECT kind, name, version, enabled, updated FROM installs WHERE game_path = ?"
+        args = [str(game_path)]
+        if kind:
+            query += " AND kind = ?"
+            args.append(kind)
+        if name:
+            query += " AND name = ?"
+            args.append(install_name(name))
+        return [
+            {"kind": r[0], "name": r[1], "version": r[2], "enabled": r[3], "updated": r[4]}
+            for r in self.connection.execute(query, args)
+        ]
+
+    def load_config(self, game_path: str) -> configparser.ConfigParser:
+        config = configparser.ConfigParser()
+        config["turtle"] = {}
+        for section in CONFIG_SECTIONS:
+            config[section] = {}
+        if game_path:
+            config["turtle"]["turtle_path"] = str(game_path)
+
+        for install in self.installs(game_path):
+            for section, (kind, column) in CONFIG_SECTIONS.items():
+                if install["kind"] != kind or install[column] is None:
+                    continue
+                config[section][install["name"]] = str(install[column])
+        # Remember what was loaded, save_config only writes what this instance changed since
+        self._loaded[str(game_path)] = self._config_values(config)
+        return config
+
+    def _config_values(self, config: configparser.ConfigParser) -> dict:
+        # (kind, name, column) -> value for every install value in the config view
+        values = {}
+        for section, (kind, column) in CONFIG_SECTIONS.items():
+            if not config.has_section(section):
+                continue
+            for name, value in config[section].items():
+                values[(kind, name, column)] = int(value) if column == "enabled" else value
+        return values
+
+    def save_config(self, config: configparser.ConfigParser):
+        # Writes the values changed since load_config in one transaction. Rows this instance never
+        # loaded or changed are left alone, so concurrent Koopa instances do not undo each other.
+        game_path = config["turtle"]["turtle_path"] if config.has_option("turtle", "turtle_path") else ""
+        values = self._config_values(config)
+        loaded = self._loaded.setdefault(game_path, {})
+        changed = {key: value for key, value in values.items() if loaded.get(key) != value}
+        now = time.time()
+
+        with self.transaction() as c:
+            if self.get_setting("turtle_path") != game_path:
+                c.execute(
+                    "INSERT OR REPLACE INTO settings (game_path, key, value) VALUES (?, 'turtle_path', ?)",
+                    (GLOBAL, game_path)
+                )
+            current = {}
+            for install in self.installs(game_path):
+                for column in ("version", "enabled"):
+                    current[(install["kind"], install["name"], column)] = install[column]
+            for column in ("version", "enabled"):
+                c.executemany(
+                    f"INSERT INTO installs (game_path, kind, name, {column}, updated) VALUES (?, ?, ?, ?, ?) "
+                    f"ON CONFLICT (game_path, kind, name) DO UPDATE SET "
+                    f"{column} = excluded.{column}, updated = excluded.updated",
+                    [(game_path, kind, name, value, now) for (kind, name, col), value in changed.items()
+                     if col == column and current.get((kind, name, col)) != value]
+                )
+        loaded.update(changed)
+
+    def install_state(self, game_path: str) -> dict:
+        # Everything recorded for a folder, snapshots store this so a rollback restores it with the files
+        game_path = str(game_path)
+        return {
+            "settings": {
+                r[0]: r[1] for r in self.connection.execute(
+                    "SELECT key, value FROM settings WHERE game_path = ?", (game_path,)
+                )
+            } if game_path else {},
+            "installs": self.installs(game_path),
+            "manifests": self.manifest(game_path),
+        }
+
+    def restore_install_state(self, game_path: str, install_state: dict):
+        game_path = str(game_path)
+        with self.transaction() as c:
+            if game_path:
+                c.execute("DELETE FROM settings WHERE game_path = ?", (game_path,))
+                c.executemany(
+                    "INSERT INTO settings (game_path, key, value) VALUES (?, ?, ?)",
+                    [(game_path, key, value) for key, value in install_state.get("settings", {}).items()]
+                )
+            c.execute("DELETE FROM installs WHERE game_path = ?", (game_path,))
+            c.execute("DELETE FROM manifests WHERE game_path = ?", (game_path,))
+            c.executemany(
+                "INSERT INTO installs (game_path, kind, name, version, enabled, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(game_path, i["kind"], i["name"], i["version"], i["enabled"], i["updated"])
+                 for i in install_state.get("installs", [])]
+            )
+            c.executemany(
+                "INSERT INTO manifests (game_path, kind, name, path, size, sha256) VALUES (?, ?, ?, ?, ?, ?)",
+                [(game_path, m["kind"], install_name(m["name"]), m["path"], m["size"], m["sha256"])
+                 for m in install_state.get("manifests", [])]
+            )
+        # The restored rows are the new baseline, the caller reloads the config view
+        self._loaded.pop(game_path, None)
+
+    def adopt_unassigned(self, game_path: str) -> int:
+        # Rows migrated from a config.cfg without turtle_path belong to the first folder that is selected
+        game_path = str(game_path)
+        if not game_path:
+            return 0
+        with self.transaction() as c:
+            count = c.execute("SELECT COUNT(*) FROM installs WHERE game_path = ?", (GLOBAL,)).fetchone()[0]
+            if count:
+                c.execute(
+                    "INSERT OR IGNORE INTO installs (game_path, kind, name, version, enabled, updated) "
+                    "SELECT ?, kind, name, version, enabled, updated FROM installs WHERE game_path = ?",
+                    (game_path, GLOBAL)
+                )
+                c.execute("DELETE FROM installs WHERE game_path = ?", (GLOBAL,))
+        self._loaded.pop(GLOBAL, None)
+        return count
+
+    def record_manifest(self, game_path: str, kind: str, name: str, files: list[tuple]):
+        # files: (relative path, size, sha256)
+        name = install_name(name)
+        with self.transaction() as c:
+            c.execute(
+                "DELETE FROM manifests WHERE game_path = ? AND kind = ? AND name = ?", (str(game_path), kind, name)
+            )
+            c.executemany(
+                "INSERT OR REPLACE INTO manifests (game_path, kind, name, path, size, sha256) VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(game_path), kind, name, path, size, sha256) for path, size, sha256 in files]
+            )
+
+    def manifest(self, game_path: str, kind: str = None, name: str = None) -> list[dict]:
+        query = "SELECT kind, name, path, size, sha256 FROM manifests WHERE game_path = ?"
+        args = [str(game_path)]
+        if kind:
+            query += " AND kind = ?"
+            args.append(kind)
+        if name:
+            query += " AND name = ?"
+            args.append(install_name(name))
+        return [
+            {"kind": r[0], "name": r[1], "path": r[2], "size": r[3], "sha256": r[4]}
+            for r in self.connection.execute(query, args)
+        ]
+
+    def get_cache(self, key: str, max_age: float = None):
+        row = self.connection.execute("SELECT value, updated FROM cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def set_cache(self, key: str, value):
+        with self.transaction() as c:
+            c.execute(
+                "INSERT OR REPLACE INTO cache (key, value, updated) VALUES (?, ?, ?)", (key, json.dumps(value), time.time())
+            )
+
+    def migrate_config(self, config_path) -> (bool, list[str]):
+        # One-time import of the old config.cfg, the file itself is left untouched
+        if self.get_meta("migrated_config"):
+            return True, []
+        if not os.path.exists(config_path):
+            self.set_meta("migrated_config", "none")
+            return True, []
+
+        config = configparser.ConfigParser()
+        try:
+            config.read(config_path)
+        except configparser.Error as e:
+            return False, [f"Could not read {config_path}: {e}"]
+        if not config.has_section("turtle"):
+            config["turtle"] = {}
+
+        with self.transaction():
+            self.save_config(config)
+            self.set_meta("migrated_config", str(config_path))
+        return True, [f"Migrated settings from {config_path}"]
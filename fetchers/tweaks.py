@@ -10,6 +10,8 @@ from pathlib import Path
 from github import Github
 from github.GitRelease import GitRelease
 
+from .state import StateStore
+
 GITHUB_KEY = os.environ.get("GITHUB_KEY", None)
 if not GITHUB_KEY:
     g = Github()
@@ -27,6 +29,9 @@ WTF_CONFIG = {
     "SET farclip": "777"
 }
 
+# Release lookups are cached in the state store, repeated update checks do not hit the GitHub API
+RELEASE_CACHE_MAX_AGE = 15 * 60
+
 
 class Tweak(object):
     name: str = ""
@@ -56,7 +61,7 @@ class Tweak(object):
         self.release = release_data["release"] if "release" in release_data else True
         self.default_enabled = release_data["default_enabled"] if "default_enabled" in release_data else True
 
-    def check_update(self, config: ConfigParser) -> bool:
+    def check_update(self, config: ConfigParser, state: StateStore = None) -> bool:
         path = config["turtle"]["turtle_path"]
 
         if config.has_option("tweaks", self.name):
@@ -64,35 +69,47 @@ class Tweak(object):
         else:
             installed_version = ""
 
-        if self.direct_url:
-            if self.direct_url.split("/")[-1] == installed_version and Path.exists(Path(path) / self.dll_name):
-                self.has_update = False
-            else:
-                self.new_version = self.direct_url.split("/")[-1]
-                self.has_update = True
+        if not self.direct_url and not self.release:
+            return self.has_update
 
-        elif self.release:
-            url = self.git_url.replace("https://github.com/", "")
-            repo = g.get_repo(url)
-            latest: GitRelease = repo.get_releases()[0]
+        download_url, version = self.resolve_download(state)
+        if version == installed_version and Path.exists(Path(path) / self.dll_name):
+            self.has_update = False
+        else:
+            self.has_update = True
+            self.new_version = version
 
-            if latest.tag_name == installed_version and Path.exists(Path(path) / self.dll_name):
-                self.has_update = False
-            else:
-                self.has_update = True
-                self.new_version = latest.tag_name
-
-            for asset in latest.assets:
-                if self.zip:
-                    if asset.name == self.zip_name:
-                        self.download_url = asset.browser_download_url
-                else:
-                    if asset.name == self.dll_name:
-                        self.download_url = asset.browser_download_url
+        if not self.direct_url:
+            self.download_url = download_url
 
         return self.has_update
 
-    def install(self, config: ConfigParser) -> (bool, list[str]):
+    def resolve_download(self, state: StateStore = None) -> (str, str):
+        # Returns the download URL and version of the latest build
+        if self.direct_url:
+            return self.direct_url, self.direct_url.split("/")[-1]
+
+        if self.release:
+            url = self.git_url.replace("https://github.com/", "")
+            cache_key = f"release:{url}"
+            release = state.get_cache(cache_key, RELEASE_CACHE_MAX_AGE) if state else None
+            if release is None:
+                repo = g.get_repo(url)
+                latest: GitRelease = repo.get_releases()[0]
+                release = {
+                    "tag": latest.tag_name,
+                    "assets": {asset.name: asset.browser_download_url for asset in latest.assets},
+                }
+                if state:
+                    state.set_cache(cache_key, release)
+
+            asset_name = self.zip_name if self.zip else self.dll_name
+            return release["assets"].get(asset_name, ""), release["tag"]
+
+        return "", ""
+
+    def install(self, config: ConfigParser, before_write=None) -> (bool, list[str]):
+        # before_write is called with the relative paths that are about to be written
         messages = []
         path = config["turtle"]["turtle_path"]
 
@@ -104,6 +121,8 @@ class Tweak(object):
                     urllib.request.urlretrieve(self.direct_url, tmp.name)
                     if self.zip:
                         with zipfile.ZipFile(tmp.name) as zip_file:
+                            if before_write:
+                                before_write([self.dll_name])
                             zip_file.extract(self.dll_name, path)
                             messages.append(f"Successfully downloaded and installed {self.name}")
                     config["tweaks"][self.name] = self.direct_url.split("/")[-1]
@@ -122,8 +141,12 @@ class Tweak(object):
                             urllib.request.urlretrieve(self.download_url, tmp.name)
                             with zipfile.ZipFile(tmp.name) as zip_file:
                                 if self.extractall:
+                                    if before_write:
+                                        before_write([n for n in zip_file.namelist() if not n.endswith("/")])
                                     zip_file.extractall(path)
                                 else:
+                                    if before_write:
+                                        before_write([self.dll_name])
                                     zip_file.extract(self.dll_name, path)
                                 messages.append(
                                     f"Successfully downloaded and installed {self.name} (version {self.new_version})"
@@ -134,6 +157,8 @@ class Tweak(object):
                         return False, [f"Failed to download {self.name} (version {self.new_version}): {e}"]
                 else:
                     try:
+                        if before_write:
+                            before_write([self.dll_name])
                         urllib.request.urlretrieve(self.download_url, Path(path) / self.dll_name)
                         config["tweaks"][self.name] = self.new_version
                         self.has_update = False
@@ -146,22 +171,28 @@ class Tweak(object):
         return True, messages
 
 
-def apply_vanilla_tweaks(path: str, url: str, settings: dict = {"windows": True, "replace": False, "farclip": 777}) -> (bool, list[str]):
+def vanilla_tweaks_binary(windows: bool) -> str:
+    return "vanilla-tweaks.exe" if windows else "vanilla-tweaks"
+
+
+def download_vanilla_tweaks(url: str, dest: str, windows: bool):
     is_zip = url.endswith(".zip")
     with tempfile.NamedTemporaryFile(mode="wb", suffix=".zip", delete=False) as tmp:
         urllib.request.urlretrieve(url, tmp.name)
         if is_zip:
             with zipfile.ZipFile(tmp.name) as zip:
-                if settings["windows"]:
-                    zip.extract("vanilla-tweaks.exe", path)
-                else:
-                    zip.extract("vanilla-tweaks", path)
+                zip.extract(vanilla_tweaks_binary(windows), dest)
         else:
             with tarfile.open(tmp.name) as tar:
-                if settings["windows"]:
-                    tar.extract("vanilla-tweaks.exe", path)
-                else:
-                    tar.extract("vanilla-tweaks", path)
+                tar.extract(vanilla_tweaks_binary(windows), dest)
+
+
+def apply_vanilla_tweaks(path: str, url: str, settings: dict = {"windows": True, "replace": False, "farclip": 777},
+                         download: bool = True) -> (bool, list[str]):
+    if download:
+        download_vanilla_tweaks(url, path, settings["windows"])
+    elif not (Path(path) / vanilla_tweaks_binary(settings["windows"])).exists():
+        return False, ["VanillaTweaks is not present in the game folder and downloading is disabled."]
 
     args = []
     if settings["windows"]:
@@ -186,16 +217,22 @@ def apply_vanilla_tweaks(path: str, url: str, settings: dict = {"windows": True,
         return False, [f"Failed to run vanilla tweaks: {e}"]
 
     output = result.communicate()
-    return True, [m.strip() for m in output[0].decode("ascii").split("\n")]
+    messages = [m.strip() for m in output[0].decode("ascii", errors="replace").split("\n")]
+    if result.returncode != 0:
+        errors = [m.strip() for m in output[1].decode("ascii", errors="replace").split("\n") if m.strip()]
+        return False, messages + errors + [f"VanillaTweaks exited with code {result.returncode}"]
+    return True, messages
+
+
+def dll_txt_content(tweaks: list[Tweak]) -> str:
+    return "twdiscord.dll\n" + "".join(tweak.dll_name + "\n" for tweak in tweaks)
 
 
 def update_dll_txt(path: str, tweaks: list[Tweak]):
     dll_path = Path(path) / "dlls.txt"
     try:
         with open(dll_path, "w") as dlltxt:
-            dlltxt.write("twdiscord.dll\n")
-            for tweak in tweaks:
-                dlltxt.write(tweak.dll_name + "\n")
+            dlltxt.write(dll_txt_content(tweaks))
     except PermissionError:
         return False, "Permission error when trying to write dlls.txt"
     return True, "Success"
@@ -210,6 +247,18 @@ def load_tweaks_from_json(json_data: dict) -> list[Tweak]:
     return tweaks
 
 
+def wtf_config_lines(existing: list[str]) -> list[str]:
+    lines = list(existing)
+    for k, v in WTF_CONFIG.items():
+        for i, l in enumerate(lines):
+            if l.startswith(k):
+                lines[i] = f"{k} \"{v}\""
+                break
+        else:
+            lines.append(f"{k} \"{v}\"")
+    return lines
+
+
 def set_wtf_config(path: str) -> (bool, list[str]):
     existing = []
     p = Path(path) / "WTF" / "Config.wtf"
@@ -221,17 +270,11 @@ def set_wtf_config(path: str) -> (bool, list[str]):
     except PermissionError:
         return False, ["Permission error when reading from Config.wtf"]
 
-    for k, v in WTF_CONFIG.items():
-        for i, l in enumerate(existing):
-            if l.startswith(k):
-                existing[i] = f"{k} \"{v}\""
-                break
-        else:
-            existing.append(f"{k} \"{v}\"")
+    lines = wtf_config_lines(existing)
 
     try:
         with open(p, "w") as cfg:
-            for l in existing:
+            for l in lines:
                 cfg.write(l + "\n")
     except PermissionError:
         return False, "Permission error when trying to write to Config.wtf"
@@ -13,7 +13,7 @@ from PySide6.QtWidgets import QApplication, QWidget, QPushButton, QMainWindow, Q
     QFileDialog, QLineEdit, QCheckBox, QProgressBar, QScrollArea, QStyle, QGroupBox
 import sys
 import fetchers
-from fetchers import apply_vanilla_tweaks, update_dll_txt, set_wtf_config
+from ui.catalog import CatalogModel, CatalogView, CatalogItem, KIND_TWEAK, KIND_MOD, KIND_ADDON
 
 LOG_INFO = 0
 LOG_ERROR = 1
@@ -32,57 +32,28 @@ else:
     CONFIG_PATH = Path.home() / '.config' / 'Koopa' / 'config.cfg'
     p = Path(Path.home() / '.config' / 'Koopa')
 
+ADDON_INDEX_DIR = p / 'addon_indexes'
+SNAPSHOT_PATH = p / 'snapshots'
+SNAPSHOTS_KEPT = 5
+STATE_PATH = p / 'koopa.db'
+VT_SETTINGS = {"windows": WINDOWS, "replace": False, "farclip": 777}
+
 if not p.exists():
     p.mkdir(parents=True, exist_ok=True)
 
 
-class TweakCheckBox(QCheckBox):
-    def __init__(self, tweak: fetchers.Tweak, parent=None, installed=False):
-        super().__init__(parent)
-        self.setText(tweak.name)
-        self.tweak: fetchers.Tweak = tweak
-        self.setToolTip(tweak.description)
-        self.setChecked(tweak.default_enabled if not installed else True)
-
-    def set_update_style(self):
-        if self.tweak.has_update:
-            self.setStyleSheet("""
-            color: green;
-            """)
-            self.setText(f"{self.tweak.name} (update found)")
-        else:
-            self.setStyleSheet("")
-            self.setText(self.tweak.name)
-
-
-class ModCheckBox(QCheckBox):
-    def __init__(self, mod: fetchers.Mod, parent=None, installed=False):
-        super().__init__(parent)
-        self.setText(mod.name)
-        self.mod: fetchers.Tweak = mod
-        self.setToolTip(mod.description)
-        self.setChecked(mod.default_enabled if not installed else True)
-
-    def set_update_style(self):
-        if self.mod.has_update:
-            self.setStyleSheet("""
-            color: green;
-            """)
-            self.setText(f"{self.mod.name} (update found)")
-        else:
-            self.setStyleSheet("")
-            self.setText(self.mod.name)
-
-
 class MainWindow(QMainWindow):
     config: configparser.ConfigParser = configparser.ConfigParser()
+    state: fetchers.StateStore = None
+    pending_manifests: list = []
     update_checked: bool = False
+    addon_index: fetchers.AddonIndex = None
+    addon_indexes: dict = {}
+    snapshot: fetchers.Snapshot = None
 
     def __init__(self):
         super().__init__()
 
-        self.load_config()
-
         self.setWindowTitle("Koopa")
         app_icon = QIcon(str(Path(__file__).parent.resolve() / "koopa.ico"))
 
@@ -99,6 +70,8 @@ class MainWindow(QMainWindow):
         self.text_area.setWordWrap(True)
         self.text_area.setTextInteractionFlags(QtCore.Qt.TextSelectableByKeyboard | QtCore.Qt.TextSelectableByMouse)
         self.log("Started Koopa, TurtleWoW patcher.")
+        self.addon_indexes = {}
+        self.load_config()
         self.text_area.setFont(QtGui.QFont("Monospace", 8))
         self.text_area.setAlignment(QtCore.Qt.AlignTop)
         self.text_area.setTextFormat(QtCore.Qt.RichText)
@@ -141,48 +114,54 @@ class MainWindow(QMainWindow):
         else:
             json_data_mods = {}
 
+        p = Path(__file__).parent.resolve() / "addons.json"
+        if p.exists():
+            with open(p) as json_file:
+                json_data_addons = json.load(json_file)
+        else:
+            json_data_addons = []
+
         tweaks = fetchers.load_tweaks_from_json(json_data_tweaks)
         mods = fetchers.load_mods_from_json(json_data_mods)
+        self.addons = fetchers.load_addons_from_json(json_data_addons)
 
-        tweak_group = QGroupBox("Tweaks")
-        tweak_vbox = QVBoxLayout()
-        mod_group = QGroupBox("Mods")
-        mod_vbox = QVBoxLayout()
+        catalog_group = QGroupBox("Tweaks, mods and AddOns")
+        catalog_vbox = QVBoxLayout()
         patch_group = QGroupBox("Patches")
         patch_vbox = QVBoxLayout()
 
-        layout_r.addWidget(tweak_group)
-        layout_r.addWidget(mod_group)
+        layout_r.addWidget(catalog_group)
         layout_r.addWidget(patch_group)
 
-        tweak_group.setLayout(tweak_vbox)
-        mod_group.setLayout(mod_vbox)
+        catalog_group.setLayout(catalog_vbox)
         patch_group.setLayout(patch_vbox)
 
-        self.tweak_buttons = []
-        self.mod_buttons = []
-
+        items = []
         for tweak in tweaks:
             installed = False
             if self.config.has_option("enabled_tweaks", tweak.name):
                 installed = self.config["enabled_tweaks"][tweak.name] == "1"
-            cb = TweakCheckBox(tweak, installed=installed)
-            tweak_vbox.addWidget(cb)
-            if tweak.name == "SuperWoW" and WINDOWS:
-                l = QLabel(self)
-                l.setWordWrap(True)
-                l.setText("NB: SuperWoW requires you to turn off real time threat monitoring in Windows Security center!")
-                l.setStyleSheet("QLabel { color: red; }")
-                tweak_vbox.addWidget(l)
-            self.tweak_buttons.append(cb)
-
+            items.append(CatalogItem(KIND_TWEAK, tweak, tweak.default_enabled if not installed else True))
         for mod in mods:
             installed = False
             if self.config.has_option("enabled_mods", mod.name):
                 installed = self.config["enabled_mods"][mod.name] == "1"
-            cb = ModCheckBox(mod, installed=installed)
-            mod_vbox.addWidget(cb)
-            self.mod_buttons.append(cb)
+            items.append(CatalogItem(KIND_MOD, mod, mod.default_enabled if not installed else True))
+        for addon in self.addons:
+            items.append(CatalogItem(KIND_ADDON, addon))
+
+        self.catalog = CatalogModel(self)
+        self.catalog.set_items(items)
+        self.catalog_view = CatalogView(self.catalog, self)
+        catalog_vbox.addWidget(self.catalog_view)
+        self.update_catalog_versions()
+
+        if WINDOWS and any(t.name == "SuperWoW" for t in tweaks):
+            l = QLabel(self)
+            l.setWordWrap(True)
+            l.setText("NB: SuperWoW requires you to turn off real time threat monitoring in Windows Security center!")
+            l.setStyleSheet("QLabel { color: red; }")
+            catalog_vbox.addWidget(l)
 
         self.patch_cb = QCheckBox(self)
         self.patch_cb.setChecked(True)
@@ -200,6 +179,12 @@ class MainWindow(QMainWindow):
 
         layout_r.addWidget(self.button_check)
 
+        self.button_preview = QPushButton("Preview changes")
+        self.button_preview.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_FileDialogDetailedView))
+        self.button_preview.clicked.connect(self.preview_button_callback)
+        self.button_preview.setEnabled(self.validate_turtle_folder(self.path_edit.text()))
+        layout_r.addWidget(self.button_preview)
+
         self.button_start = QPushButton("Install tweaks and patch WoW.exe")
         self.button_start.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogOkButton))
         self.set_start_button_state(False)
@@ -207,6 +192,24 @@ class MainWindow(QMainWindow):
 
         layout_r.addWidget(self.button_start)
 
+        self.button_rollback = QPushButton("Roll back last install")
+        self.button_rollback.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_ArrowBack))
+        self.button_rollback.clicked.connect(self.rollback_callback)
+        layout_r.addWidget(self.button_rollback)
+        self.update_rollback_button()
+
+        bundle_layout = QHBoxLayout()
+        self.button_export = QPushButton("Export offline bundle")
+        self.button_export.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton))
+        self.button_export.clicked.connect(self.export_button_callback)
+        self.button_import = QPushButton("Install from bundle")
+        self.button_import.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogOpenButton))
+        self.button_import.clicked.connect(lambda: asyncio.ensure_future(self.import_button_callback()))
+        self.button_import.setEnabled(self.validate_turtle_folder(self.path_edit.text()))
+        bundle_layout.addWidget(self.button_export)
+        bundle_layout.addWidget(self.button_import)
+        layout_r.addLayout(bundle_layout)
+
         if WINDOWS or True:
             self.button_launch = QPushButton("Launch game")
             self.button_launch.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
@@ -230,6 +233,9 @@ class MainWindow(QMainWindow):
 
         # Set the central widget of the Window.
         self.setCentralWidget(widget)
+
+        if self.validate_turtle_folder(self.path_edit.text()):
+            self.refresh_addon_index()
         # asyncio.run(self.check_updates())
 
     def launch_game(self):
@@ -258,31 +264,22 @@ class MainWindow(QMainWindow):
 
         updates_found: int = 0
         QApplication.processEvents()
-        for tb in self.tweak_buttons:
+        for entry in self.catalog.entries(KIND_TWEAK) + self.catalog.entries(KIND_MOD):
             try:
-                has_update = tb.tweak.check_update(self.config)
-            except Exception as e:
-                self.log(f"An error occurred: {e}", LOG_ERROR)
-                QApplication.processEvents()
-                continue
-
-            if has_update and tb.isChecked():
-                updates_found += 1
-            tb.set_update_style()
-            QApplication.processEvents()
-
-        for mod in self.mod_buttons:
-            try:
-                has_update = mod.mod.check_update(self.config)
+                if isinstance(entry, fetchers.Tweak):
+                    has_update = entry.check_update(self.config, self.state)
+                else:
+                    has_update = entry.check_update(self.config)
             except Exception as e:
                 self.log(f"An error occurred: {e}", LOG_ERROR)
                 QApplication.processEvents()
                 continue
 
-            if has_update and mod.isChecked():
+            if has_update and self.catalog.is_checked(entry):
                 updates_found += 1
-            mod.set_update_style()
             QApplication.processEvents()
+        # Repaint all rows at once when the check is done
+        self.catalog.refresh()
 
         self.set_start_button_state(True)
         self.button_check.setEnabled(True)
@@ -295,26 +292,31 @@ class MainWindow(QMainWindow):
         QApplication.processEvents()
 
     def load_config(self):
-        if os.path.exists(CONFIG_PATH):
-            self.config.read(CONFIG_PATH)
-            if not self.config.has_section("tweaks"):
-                self.config["tweaks"] = {}
-            if not self.config.has_section("mods"):
-                self.config["mods"] = {}
-            if not self.config.has_section("enabled_tweaks"):
-                self.config["enabled_tweaks"] = {}
-            if not self.config.has_section("enabled_mods"):
-                self.config["enabled_mods"] = {}
-        else:
-            self.config["turtle"] = {}
-            self.config["tweaks"] = {}
-            self.config["enabled_tweaks"] = {}
-            self.config["enabled_mods"] = {}
+        self.pending_manifests = []
+        self.state = fetchers.StateStore(STATE_PATH)
+        success, messages = self.state.migrate_config(CONFIG_PATH)
+        for m in messages:
+            self.log(m, LOG_INFO if success else LOG_ERROR)
+        self.config = self.state.load_config(self.state.get_setting("turtle_path"))
 
     def save_config(self):
+        # Config changes and queued manifests are committed together in one transaction
         self.config["turtle"]["turtle_path"] = self.path_edit.text()
-        with open(CONFIG_PATH, 'w') as configfile:
-            self.config.write(configfile)
+        with self.state.transaction():
+            self.state.save_config(self.config)
+            for game_path, kind, name, files in self.pending_manifests:
+                self.state.record_manifest(game_path, kind, name, files)
+        self.pending_manifests = []
+
+    def record_manifest(self, kind: str, name: str, paths: list[str]):
+        # Hashes the files now, the rows are written by the next save_config
+        game_path = self.config["turtle"]["turtle_path"]
+        files = []
+        for rel in paths:
+            full = Path(game_path) / rel
+            if full.is_file():
+                files.append((rel, full.stat().st_size, fetchers.file_sha256(full)))
+        self.pending_manifests.append((game_path, kind, name, files))
 
     def log(self, text, level=LOG_INFO):
         if level == LOG_ERROR:
@@ -344,8 +346,18 @@ class MainWindow(QMainWindow):
             if self.validate_turtle_folder(file):
                 self.button_check.setEnabled(True)
                 self.button_launch.setEnabled(True)
+                self.button_preview.setEnabled(True)
+                self.button_import.setEnabled(True)
                 self.log(f"Selected {file}")
+                adopted = self.state.adopt_unassigned(file)
+                if adopted:
+                    self.log(f"Assigned {adopted} migrated install records to {file}")
+                if old_path != file or adopted:
+                    # Installed versions are tracked per game folder
+                    self.config = self.state.load_config(file)
                 self.save_config()
+                self.refresh_addon_index()
+                self.update_rollback_button()
                 if old_path != file:
                     self.update_checked = False
                     self.set_start_button_state(False)
@@ -355,87 +367,53 @@ class MainWindow(QMainWindow):
             else:
                 self.button_check.setEnabled(False)
                 self.button_launch.setEnabled(False)
+                self.button_rollback.setEnabled(False)
+                self.button_preview.setEnabled(False)
+                self.button_import.setEnabled(False)
                 self.log("WoW.exe not found in that directory, skipping")
 
+    def set_enabled_flags(self):
+        for tweak in self.catalog.entries(KIND_TWEAK):
+            self.config.set("enabled_tweaks", tweak.name, "1" if self.catalog.is_checked(tweak) else "0")
+        for mod in self.catalog.entries(KIND_MOD):
+            self.config.set("enabled_mods", mod.name, "1" if self.catalog.is_checked(mod) else "0")
+
+    def make_plan(self) -> fetchers.Plan:
+        return fetchers.make_plan(
+            self.config["turtle"]["turtle_path"],
+            self.catalog.entries(KIND_TWEAK, checked_only=True),
+            self.catalog.entries(KIND_MOD, checked_only=True),
+            self.state, VT_URL, VT_SETTINGS
+        )
+
+    def preview_button_callback(self):
+        if not self.validate_turtle_folder(self.config["turtle"]["turtle_path"]):
+            return
+        if not self.update_checked:
+            self.log("Updates have not been checked yet, tweak and mod updates are not included.", LOG_WARNING)
+        self.log("Planned changes:")
+        for line in self.make_plan().describe():
+            self.log(line)
+
     async def start_button_callback(self):
-        # Do stuff here
         errors = 0
         if self.validate_turtle_folder(self.config["turtle"]["turtle_path"]):
             self.progress.setValue(0)
-            total = 1
-            for tb in self.tweak_buttons:
-                if tb.isChecked() and tb.tweak.has_update:
-                    total += 1
-            for mb in self.mod_buttons:
-                if mb.isChecked() and mb.mod.has_update:
-                    total += 1
-            i = 0
-            for tb in self.tweak_buttons:
-                if tb.isChecked():
-                    self.config.set("enabled_tweaks", tb.tweak.name, "1")
-                else:
-                    self.config.set("enabled_tweaks", tb.tweak.name, "0")
-
-                if tb.isChecked() and tb.tweak.has_update:
-                    print(f"Installing/updating {tb.tweak.name}")
-                    i += 1
-                    try:
-                        success, messages = tb.tweak.install(self.config)
-                        tb.set_update_style()
-                        self.save_config()
-                    except Exception as e:
-                        errors += 1
-                        self.log(f"Failed to install tweak {tb.tweak.name}: {e}", level=LOG_ERROR)
-                        QApplication.processEvents()
-                        continue
-                    QApplication.processEvents()
-                    self.progress.setValue(int(i * (100 / total)))
-                    if not success:
-                        errors += 1
-                    for m in messages:
-                        self.log(m, level=LOG_INFO if success else LOG_ERROR)
-
-            for mb in self.mod_buttons:
-                if mb.isChecked():
-                    self.config.set("enabled_mods", mb.mod.name, "1")
-                else:
-                    self.config.set("enabled_mods", mb.mod.name, "0")
-
-                if mb.isChecked() and mb.mod.has_update:
-                    i += 1
-                    try:
-                        success, messages = mb.mod.install(self.config)
-                        mb.set_update_style()
-                    except Exception as e:
-                        errors += 1
-                        self.log(f"Failed to install mod {mb.mod.name}: {e}", level=LOG_ERROR)
-                        QApplication.processEvents()
-                        continue
-                    QApplication.processEvents()
-                    self.progress.setValue(int(i * (100 / total)))
-                    if not success:
-                        errors += 1
-                    for m in messages:
-                        self.log(m, level=LOG_INFO if success else LOG_ERROR)
-
-            result, messages = apply_vanilla_tweaks(self.config["turtle"]["turtle_path"], VT_URL, {"windows": WINDOWS, "replace": False, "farclip": 777})
-            if not result:
-                errors += 1
-            for m in messages:
-                self.log(m, level=LOG_INFO if result else LOG_ERROR)
+            plan = self.make_plan()
+            if len(plan) == 0:
+                self.progress.setValue(100)
+                self.log("Everything is already up to date.", level=LOG_SUCCESS)
+                self.set_enabled_flags()
+                self.save_config()
+                return
+
+            for line in plan.describe():
+                self.log(line)
+            # The snapshot has to hold the selection from before this install, so flags are set after it
+            self.create_snapshot()
+            self.set_enabled_flags()
+            errors += self.execute_plan(plan)
 
-            success, messages = update_dll_txt(self.config["turtle"]["turtle_path"], [tb.tweak for tb in self.tweak_buttons if tb.isChecked()])
-            if success:
-                self.log("Updated dlls.txt with the selected tweaks.")
-            else:
-                errors += 1
-                self.log("Failed to update dlls.txt.", level=LOG_ERROR)
-            success, messages = set_wtf_config(self.config["turtle"]["turtle_path"])
-            if success:
-                self.log("Config updated.", level=LOG_INFO)
-            else:
-                errors += 1
-                self.log("Failed to update config.", level=LOG_ERROR)
             self.progress.setValue(100)
             if errors == 0:
                 self.log("SUCCESS! Remember to start the game with WoW_tweaked.exe from now on.", level=LOG_SUCCESS)
@@ -443,6 +421,240 @@ class MainWindow(QMainWindow):
                 self.log(f"There were {errors} errors, read log to see what went wrong.", level=LOG_WARNING)
 
         self.save_config()
+        self.update_rollback_button()
+
+    def execute_plan(self, plan: fetchers.Plan, vt_url: str = VT_URL, download: bool = True) -> int:
+        errors = 0
+        selected_tweaks = self.catalog.entries(KIND_TWEAK, checked_only=True)
+        for i, op in enumerate(plan):
+            if op.target is not None:
+                self.catalog.set_progress(op.target, int(i * (100 / len(plan))))
+                QApplication.processEvents()
+            written = []
+
+            def before_write(paths: list[str], written=written):
+                written.extend(paths)
+                self.extend_snapshot(paths)
+
+            try:
+                success, messages = fetchers.execute_operation(
+                    op, self.config, self.state, selected_tweaks, vt_url, VT_SETTINGS, download, before_write
+                )
+            except Exception as e:
+                errors += 1
+                self.log(f"Failed to {op.describe()}: {e}", level=LOG_ERROR)
+                if op.target is not None:
+                    self.catalog.set_progress(op.target, -1)
+                QApplication.processEvents()
+                continue
+
+            if op.kind == fetchers.OP_INSTALL_TWEAK:
+                if success:
+                    self.record_manifest("tweak", op.target.name, written or [op.target.dll_name])
+            elif op.kind == fetchers.OP_INSTALL_MOD:
+                if success:
+                    self.record_manifest("mod", op.target.name, [f"{op.target.dest_path}/{op.target.mpq_name}"])
+            if op.target is not None:
+                self.catalog.set_progress(op.target, -1)
+
+            if not success:
+                errors += 1
+            for m in messages:
+                self.log(m, level=LOG_INFO if success else LOG_ERROR)
+            self.progress.setValue(int((i + 1) * (100 / len(plan))))
+            QApplication.processEvents()
+        self.update_catalog_versions()
+        return errors
+
+    def export_button_callback(self):
+        file, _ = QFileDialog.getSaveFileName(self, "Export offline bundle", "koopa-bundle.koopa",
+                                              "Koopa bundle (*.koopa)")
+        if not file:
+            return
+        self.log("Downloading all tweaks and mods for the offline bundle...")
+        QApplication.processEvents()
+        success, messages = fetchers.export_bundle(
+            file, self.catalog.entries(KIND_TWEAK), self.catalog.entries(KIND_MOD), VT_URL, WINDOWS
+        )
+        for m in messages:
+            self.log(m, LOG_INFO if success else LOG_ERROR)
+        if success:
+            self.log(f"Offline bundle saved to {file}", LOG_SUCCESS)
+
+    async def import_button_callback(self):
+        if not self.validate_turtle_folder(self.config["turtle"]["turtle_path"]):
+            return
+        file, _ = QFileDialog.getOpenFileName(self, "Import offline bundle", "", "Koopa bundle (*.koopa)")
+        if not file:
+            return
+
+        errors = 0
+        self.progress.setValue(0)
+        self.create_snapshot()
+        self.set_enabled_flags()
+        selected = self.catalog.entries(KIND_TWEAK, checked_only=True) + \
+            self.catalog.entries(KIND_MOD, checked_only=True)
+        names = {entry.name for entry in selected}
+        success, messages, manifest, installed = fetchers.import_bundle(
+            file, self.config, WINDOWS, names, self.extend_snapshot
+        )
+        for m in messages:
+            self.log(m, LOG_INFO if success else LOG_ERROR)
+        if not success:
+            errors += 1
+        if not manifest:
+            self.save_config()
+            return
+
+        # Only items the bundle installed completely, the rest is left to the plan below and reported
+        imported = {item["name"]: [f["path"] for f in item["files"]] for item in manifest["items"]
+                    if item["name"] in installed}
+        for tweak in self.catalog.entries(KIND_TWEAK, checked_only=True):
+            if tweak.name in imported:
+                tweak.has_update = False
+                self.record_manifest("tweak", tweak.name, imported[tweak.name])
+        for mod in self.catalog.entries(KIND_MOD, checked_only=True):
+            if mod.name in imported:
+                mod.has_update = False
+                self.record_manifest("mod", mod.name, imported[mod.name])
+        self.catalog.refresh(selected)
+
+        # Everything still needed has to be done without network access
+        plan = self.make_plan()
+        offline = fetchers.Plan(plan.game_path)
+        for op in plan:
+            if op.kind in (fetchers.OP_INSTALL_TWEAK, fetchers.OP_INSTALL_MOD):
+                errors += 1
+                self.log(f"Skipped, not in bundle: {op.describe()}", LOG_WARNING)
+            else:
+                offline.operations.append(op)
+        errors += self.execute_plan(offline, manifest["vt_url"], download=False)
+
+        self.progress.setValue(100)
+        if errors == 0:
+            self.log("SUCCESS! Installed from offline bundle, start the game with WoW_tweaked.exe.", level=LOG_SUCCESS)
+        else:
+            self.log(f"There were {errors} errors, read log to see what went wrong.", level=LOG_WARNING)
+        self.save_config()
+        self.update_rollback_button()
+
+    def create_snapshot(self):
+        game_path = self.config["turtle"]["turtle_path"]
+        paths = fetchers.snapshot_paths(self.catalog.entries(KIND_TWEAK), self.catalog.entries(KIND_MOD), WINDOWS)
+        # Files recorded by earlier installs, e.g. everything an extractall tweak unpacked
+        paths += [m["path"] for m in self.state.manifest(game_path)]
+        self.snapshot = None
+        # Flush first so the snapshot holds the same install state as the files on disk
+        self.save_config()
+        meta = {"install_state": self.state.install_state(game_path)}
+        try:
+            store = fetchers.SnapshotStore(SNAPSHOT_PATH)
+            self.snapshot, messages = store.create(game_path, paths, "Before install", meta)
+            store.prune(game_path, SNAPSHOTS_KEPT)
+        except OSError as e:
+            self.log(f"Failed to create snapshot: {e}", LOG_WARNING)
+            return
+        for m in messages:
+            self.log(m)
+        QApplication.processEvents()
+
+    def extend_snapshot(self, paths: list[str]):
+        # Called by installs right before they write files the snapshot could not know about
+        if self.snapshot is None:
+            return
+        try:
+            messages = fetchers.SnapshotStore(SNAPSHOT_PATH).extend(self.snapshot, paths)
+        except OSError as e:
+            messages = [f"Failed to add files to the snapshot: {e}"]
+        for m in messages:
+            self.log(m, LOG_WARNING)
+
+    def update_rollback_button(self):
+        path = self.path_edit.text()
+        if self.validate_turtle_folder(path) and SNAPSHOT_PATH.exists():
+            self.button_rollback.setEnabled(fetchers.SnapshotStore(SNAPSHOT_PATH).latest(path) is not None)
+        else:
+            self.button_rollback.setEnabled(False)
+
+    def rollback_callback(self):
+        game_path = self.config["turtle"]["turtle_path"]
+        snapshot = fetchers.SnapshotStore(SNAPSHOT_PATH).latest(game_path)
+        if snapshot is None:
+            self.log("No snapshot found for this folder.", LOG_WARNING)
+            return
+
+        self.log(f"Rolling back to snapshot from {snapshot.created_str()}...")
+        QApplication.processEvents()
+        success, messages = fetchers.SnapshotStore(SNAPSHOT_PATH).restore(snapshot)
+        for m in messages:
+            self.log(m, LOG_INFO if success else LOG_ERROR)
+
+        # Records of installs that were rolled back must not be written after the restore
+        self.pending_manifests = [m for m in self.pending_manifests if m[0] != game_path]
+        if not success:
+            # The records would describe files that are not on disk, keep the current ones
+            self.log("Install records were not rolled back because some files could not be restored.", LOG_WARNING)
+        elif "install_state" in snapshot.meta:
+            self.state.restore_install_state(game_path, snapshot.meta["install_state"])
+        else:
+            self.log("This snapshot has no install records, only the files were restored.", LOG_WARNING)
+        self.config = self.state.load_config(game_path)
+        self.update_catalog_versions()
+        # Put the selection back as well, dlls.txt was restored to match it
+        selection = {}
+        for kind, section in ((KIND_TWEAK, "enabled_tweaks"), (KIND_MOD, "enabled_mods")):
+            for entry in self.catalog.entries(kind):
+                if self.config.has_option(section, entry.name):
+                    selection[entry] = {"checked": self.config[section][entry.name] == "1"}
+        self.catalog.update_items(selection)
+        # Installed versions changed, updates have to be checked again
+        self.update_checked = False
+        self.set_start_button_state(False)
+        if success:
+            self.log("Rollback complete.", LOG_SUCCESS)
+        else:
+            self.log("Rollback finished with errors, read log to see what went wrong.", LOG_WARNING)
+
+    def refresh_addon_index(self):
+        addons_path = Path(self.path_edit.text()) / "Interface" / "AddOns"
+        if addons_path not in self.addon_indexes:
+            self.addon_indexes[addons_path] = fetchers.AddonIndex(
+                addons_path, fetchers.addon_index_file(ADDON_INDEX_DIR, addons_path)
+            )
+        self.addon_index = self.addon_indexes[addons_path]
+
+        try:
+            added, updated, removed = self.addon_index.refresh()
+        except OSError as e:
+            self.log(f"Failed to read installed AddOns: {e}", LOG_ERROR)
+            return
+
+        if added or updated or removed:
+            success, messages = self.addon_index.save()
+            for m in messages:
+                self.log(m, LOG_INFO if success else LOG_ERROR)
+        self.log(f"Found {len(self.addon_index.addons)} installed AddOns "
+                 f"({len(added)} new, {len(updated)} changed, {len(removed)} removed since last scan).")
+
+        installed = [a.name for a in self.addons if a.is_installed(self.addon_index)]
+        if installed:
+            self.log(f"Installed from catalog: {', '.join(installed)}")
+        for name, deps in self.addon_index.missing_dependencies().items():
+            self.log(f"AddOn {name} is missing dependencies: {', '.join(deps)}", LOG_WARNING)
+        self.update_catalog_versions()
+
+    def update_catalog_versions(self):
+        updates = {}
+        for tweak in self.catalog.entries(KIND_TWEAK):
+            updates[tweak] = {"installed_version": self.config["tweaks"].get(tweak.name, "")}
+        for mod in self.catalog.entries(KIND_MOD):
+            updates[mod] = {"installed_version": self.config["mods"].get(mod.name, "")}
+        for addon in self.catalog.entries(KIND_ADDON):
+            version = ""
+            if self.addon_index is not None and addon.is_installed(self.addon_index):
+                version = addon.installed_version(self.addon_index) or "installed"
+            updates[addon] = {"installed_version": version}
+        self.catalog.update_items(updates)
 
     def validate_turtle_folder(self, path: str) -> bool:
         if not os.path.isdir(path):
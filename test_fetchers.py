@@ -0,0 +1,172 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from fetchers.bundle import _safe_destination
+from fetchers.snapshots import CHUNK_MAX, CHUNK_MIN, SnapshotStore, chunk_boundaries
+from fetchers.state import StateStore
+
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+class ChunkerTest(unittest.TestCase):
+    def test_chunks_cover_data_within_limits(self):
+        data = random_bytes(2 * 1024 * 1024, 1)
+        ends = chunk_boundaries(data)
+        self.assertEqual(ends[-1], len(data))
+        start = 0
+        for end in ends[:-1]:
+            self.assertGreaterEqual(end - start, CHUNK_MIN)
+            self.assertLessEqual(end - start, CHUNK_MAX)
+            start = end
+
+    def test_insertion_keeps_later_chunks(self):
+        data = random_bytes(1024 * 1024, 2)
+        before = chunk_boundaries(data)
+        after = chunk_boundaries(data[:1000] + b"inserted" + data[1000:])
+        chunks_before = {data[s:e] for s, e in zip([0] + before, before)}
+        changed = data[:1000] + b"inserted" + data[1000:]
+        chunks_after = {changed[s:e] for s, e in zip([0] + after, after)}
+        # Only the chunk around the insertion differs
+        self.assertGreaterEqual(len(chunks_before & chunks_after), len(chunks_before) - 2)
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.game = Path(self.tmp.name) / "game"
+        self.game.mkdir()
+        self.store = SnapshotStore(Path(self.tmp.name) / "snapshots")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_restore_round_trip(self):
+        big = random_bytes(700 * 1024, 3)
+        (self.game / "WoW_tweaked.exe").write_bytes(big)
+        (self.game / "dlls.txt").write_text("twdiscord.dll\n")
+        snapshot, _ = self.store.create(str(self.game), ["WoW_tweaked.exe", "dlls.txt", "SuperWoW.dll"])
+
+        (self.game / "WoW_tweaked.exe").write_bytes(big[:1000] + b"patched" + big[1000:])
+        (self.game / "dlls.txt").unlink()
+        (self.game / "SuperWoW.dll").write_bytes(b"new")
+
+        success, messages = self.store.restore(snapshot)
+        self.assertTrue(success, messages)
+        self.assertEqual((self.game / "WoW_tweaked.exe").read_bytes(), big)
+        self.assertEqual((self.game / "dlls.txt").read_text(), "twdiscord.dll\n")
+        self.assertFalse((self.game / "SuperWoW.dll").exists())
+
+    def test_extend_keeps_content_from_before_the_install(self):
+        (self.game / "dlls.txt").write_text("old")
+        snapshot, _ = self.store.create(str(self.game), ["dlls.txt"])
+        (self.game / "dlls.txt").write_text("new")
+        (self.game / "lib").mkdir()
+        (self.game / "lib" / "existing.lua").write_text("old")
+        self.store.extend(snapshot, ["dlls.txt", "lib/existing.lua", "lib/extra.lua"])
+        (self.game / "lib" / "existing.lua").write_text("new")
+        (self.game / "lib" / "extra.lua").write_text("new")
+
+        success, messages = self.store.restore(self.store.latest(str(self.game)))
+        self.assertTrue(success, messages)
+        # extend() must not replace the entry taken before the install with the modified file
+        self.assertEqual((self.game / "dlls.txt").read_text(), "old")
+        self.assertEqual((self.game / "lib" / "existing.lua").read_text(), "old")
+        self.assertFalse((self.game / "lib" / "extra.lua").exists())
+
+
+class StateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "koopa.db"
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp.cleanup()
+
+    def open_store(self) -> StateStore:
+        store = StateStore(self.db_path)
+        self.stores.append(store)
+        return store
+
+    def test_concurrent_saves_keep_each_others_changes(self):
+        setup = self.open_store()
+        config = setup.load_config("/game")
+        config["tweaks"]["SuperWoW"] = "v1"
+        config["tweaks"]["nampower"] = "v1"
+        setup.save_config(config)
+
+        a = self.open_store()
+        b = self.open_store()
+        config_a = a.load_config("/game")
+        config_b = b.load_config("/game")
+        config_b["tweaks"]["SuperWoW"] = "v2"
+        b.save_config(config_b)
+        # a still holds SuperWoW v1, saving its own change must not undo b's
+        config_a["tweaks"]["nampower"] = "v2"
+        a.save_config(config_a)
+
+        tweaks = dict(self.open_store().load_config("/game")["tweaks"])
+        self.assertEqual(tweaks, {"superwow": "v2", "nampower": "v2"})
+
+    def test_manifest_names_match_install_names(self):
+        store = self.open_store()
+        config = store.load_config("/game")
+        config["tweaks"]["SuperWoW"] = "v1"
+        store.save_config(config)
+        store.record_manifest("/game", "tweak", "SuperWoW", [("SuperWoW.dll", 3, "abc")])
+        self.assertEqual(store.installs("/game", name="SuperWoW")[0]["name"], "superwow")
+        self.assertEqual(store.manifest("/game", name="SuperWoW")[0]["name"], "superwow")
+
+    def test_restore_install_state(self):
+        store = self.open_store()
+        config = store.load_config("/game")
+        config["tweaks"]["SuperWoW"] = "v1"
+        store.save_config(config)
+        install_state = store.install_state("/game")
+
+        config["tweaks"]["SuperWoW"] = "v2"
+        config["mods"]["HD Models"] = "url"
+        store.save_config(config)
+        store.record_manifest("/game", "mod", "HD Models", [("Data/patch-x.mpq", 1, "abc")])
+
+        store.restore_install_state("/game", install_state)
+        config = store.load_config("/game")
+        self.assertEqual(dict(config["tweaks"]), {"superwow": "v1"})
+        self.assertEqual(dict(config["mods"]), {})
+        self.assertEqual(store.manifest("/game"), [])
+
+
+class SafeDestinationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.game = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_accepts_relative_paths(self):
+        self.assertEqual(_safe_destination(self.game, "Data/patch-x.mpq"), Path(self.game) / "Data" / "patch-x.mpq")
+
+    def test_rejects_paths_outside_the_game_folder(self):
+        for rel in ["", "../WoW.exe", "Data/../../WoW.exe", "/etc/passwd", "C:/Windows/evil.dll",
+                    "C:evil.dll", "C:\\Windows\\evil.dll", "Data\\..\\..\\evil.dll", "\\\\server\\share\\evil.dll"]:
+            self.assertIsNone(_safe_destination(self.game, rel), rel)
+
+    @unittest.skipIf(sys.platform == "win32", "creating symlinks needs extra privileges on Windows")
+    def test_rejects_symlinks_out_of_the_game_folder(self):
+        outside = tempfile.TemporaryDirectory()
+        self.addCleanup(outside.cleanup)
+        os.symlink(outside.name, os.path.join(self.game, "Data"))
+        self.assertIsNone(_safe_destination(self.game, "Data/patch-x.mpq"))
+
+
+if __name__ == "__main__":
+    unittest.main()
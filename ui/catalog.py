@@ -0,0 +1,219 @@
+from PySide6 import QtGui
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox, QListView, QAbstractItemView
+
+KIND_TWEAK = "tweak"
+KIND_MOD = "mod"
+KIND_ADDON = "addon"
+
+KindRole = int(Qt.ItemDataRole.UserRole) + 1
+EntryRole = int(Qt.ItemDataRole.UserRole) + 2
+InstalledVersionRole = int(Qt.ItemDataRole.UserRole) + 3
+ProgressRole = int(Qt.ItemDataRole.UserRole) + 4
+
+FILTER_ALL = "All"
+FILTER_TWEAKS = "Tweaks"
+FILTER_MODS = "Mods"
+FILTER_ADDONS = "AddOns"
+FILTER_UPDATES = "Updates"
+
+UPDATE_BRUSH = QtGui.QBrush(QtGui.QColor("green"))
+NOT_INSTALLED_BRUSH = QtGui.QBrush(QtGui.QColor("gray"))
+
+
+class CatalogItem(object):
+    kind: str = ""
+    entry = None
+    checked: bool = False
+    installed_version: str = ""
+    progress: int = -1
+
+    def __init__(self, kind: str, entry, checked: bool = False):
+        self.kind = kind
+        self.entry = entry
+        self.checked = checked
+        self.installed_version = ""
+        self.progress = -1
+
+    @property
+    def checkable(self) -> bool:
+        # Addons are only listed, Koopa does not install them (yet)
+        return self.kind != KIND_ADDON
+
+    @property
+    def has_update(self) -> bool:
+        return getattr(self.entry, "has_update", False)
+
+
+class CatalogModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items: list[CatalogItem] = []
+        self._rows: dict[int, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+        item = self.items[index.row()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            text = item.entry.name
+            if item.progress >= 0:
+                text += f" (installing {item.progress}%)"
+            elif item.has_update:
+                text += " (update found)"
+            elif item.kind == KIND_ADDON and item.installed_version:
+                text += f" ({item.installed_version})"
+            return text
+        if role == Qt.ItemDataRole.ToolTipRole:
+            tooltip = item.entry.description
+            if item.installed_version:
+                tooltip += f"\n\nInstalled: {item.installed_version}"
+            return tooltip
+        if role == Qt.ItemDataRole.CheckStateRole and item.checkable:
+            return Qt.CheckState.Checked if item.checked else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if item.has_update:
+                return UPDATE_BRUSH
+            if item.kind == KIND_ADDON and not item.installed_version:
+                return NOT_INSTALLED_BRUSH
+            return None
+        if role == KindRole:
+            return item.kind
+        if role == EntryRole:
+            return item.entry
+        if role == InstalledVersionRole:
+            return item.installed_version
+        if role == ProgressRole:
+            return item.progress
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        item = self.items[index.row()]
+        if not item.checkable:
+            return False
+        item.checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if self.items[index.row()].checkable:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    def set_items(self, items: list[CatalogItem]):
+        self.beginResetModel()
+        self.items = items
+        self._rows = {id(item.entry): row for row, item in enumerate(items)}
+        self.endResetModel()
+
+    def row_of(self, entry) -> int:
+        return self._rows.get(id(entry), -1)
+
+    def entries(self, kind: str, checked_only: bool = False) -> list:
+        return [i.entry for i in self.items if i.kind == kind and (i.checked or not checked_only)]
+
+    def is_checked(self, entry) -> bool:
+        row = self.row_of(entry)
+        return row >= 0 and self.items[row].checked
+
+    def refresh(self, entries: list = None):
+        # One dataChanged for the whole span instead of one signal (and repaint) per row
+        if entries is None:
+            rows = range(len(self.items))
+        else:
+            rows = [r for r in (self.row_of(e) for e in entries) if r >= 0]
+        if not rows:
+            return
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)))
+
+    def update_items(self, updates: dict):
+        # updates: entry -> {"checked", "installed_version", "progress"}, applied as one batch
+        changed = []
+        for entry, values in updates.items():
+            row = self.row_of(entry)
+            if row < 0:
+                continue
+            item = self.items[row]
+            for key, value in values.items():
+                setattr(item, key, value)
+            changed.append(entry)
+        self.refresh(changed)
+
+    def set_progress(self, entry, progress: int):
+        self.update_items({entry: {"progress": progress}})
+
+
+class CatalogFilterModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ""
+        self.category = FILTER_ALL
+
+    def set_text(self, text: str):
+        self.text = text.strip().lower()
+        self.invalidateFilter()
+
+    def set_category(self, category: str):
+        self.category = category
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        item = self.sourceModel().items[source_row]
+        if self.category == FILTER_TWEAKS and item.kind != KIND_TWEAK:
+            return False
+        if self.category == FILTER_MODS and item.kind != KIND_MOD:
+            return False
+        if self.category == FILTER_ADDONS and item.kind != KIND_ADDON:
+            return False
+        if self.category == FILTER_UPDATES and not item.has_update:
+            return False
+        if self.text:
+            return self.text in item.entry.name.lower() or self.text in item.entry.description.lower()
+        return True
+
+
+class CatalogView(QWidget):
+    def __init__(self, model: CatalogModel, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.proxy = CatalogFilterModel(self)
+        self.proxy.setSourceModel(model)
+
+        self.search = QLineEdit(self)
+        self.search.setPlaceholderText("Search...")
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self.proxy.set_text)
+
+        self.category = QComboBox(self)
+        self.category.addItems([FILTER_ALL, FILTER_TWEAKS, FILTER_MODS, FILTER_ADDONS, FILTER_UPDATES])
+        self.category.currentTextChanged.connect(self.proxy.set_category)
+
+        self.list = QListView(self)
+        self.list.setModel(self.proxy)
+        # Uniform rows let the view lay out only what is visible instead of measuring every entry
+        self.list.setUniformItemSizes(True)
+        self.list.setLayoutMode(QListView.LayoutMode.Batched)
+        self.list.setBatchSize(100)
+        self.list.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.list.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.search)
+        filter_layout.addWidget(self.category)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.list)
+        self.setLayout(layout)